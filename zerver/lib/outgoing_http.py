@@ -27,6 +27,7 @@ class OutgoingSession(requests.Session):
         headers: dict[str, str] | None = None,
         max_retries: int | Retry | None = None,
         proxies: dict[str, str] | None = None,
+        pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
     ) -> None:
         super().__init__()
         retry: Retry | None = Retry(total=0)
@@ -35,7 +36,9 @@ class OutgoingSession(requests.Session):
                 retry = max_retries
             else:
                 retry = Retry(total=max_retries, backoff_factor=1)
-        outgoing_adapter = OutgoingHTTPAdapter(role=role, timeout=timeout, max_retries=retry)
+        outgoing_adapter = OutgoingHTTPAdapter(
+            role=role, timeout=timeout, max_retries=retry, pool_maxsize=pool_maxsize
+        )
         self.mount("http://", outgoing_adapter)
         self.mount("https://", outgoing_adapter)
         if headers:
@@ -61,10 +64,16 @@ class OutgoingHTTPAdapter(requests.adapters.HTTPAdapter):
     role: str
     timeout: float
 
-    def __init__(self, role: str, timeout: float, max_retries: Retry | None) -> None:
+    def __init__(
+        self,
+        role: str,
+        timeout: float,
+        max_retries: Retry | None,
+        pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
+    ) -> None:
         self.role = role
         self.timeout = timeout
-        super().__init__(max_retries=max_retries)
+        super().__init__(max_retries=max_retries, pool_maxsize=pool_maxsize)
 
     @override
     def send(self, *args: Any, **kwargs: Any) -> requests.Response:
@@ -1,12 +1,16 @@
 import json
 
 import requests
-from pyoembed import PyOembedException, oEmbed
 
 from zerver.lib.url_preview.types import UrlEmbedData, UrlOEmbedData
 
 
 def get_oembed_data(url: str, maxwidth: int = 640, maxheight: int = 480) -> UrlEmbedData | None:
+    # We import pyoembed here, because it's only used by the
+    # embed_links worker, and the other queue workers that import
+    # this module shouldn't pay the cost of loading it at startup.
+    from pyoembed import PyOembedException, oEmbed
+
     # pyoembed makes its requests directly, not through OutgoingSession,
     # but they still go through Smokescreen: requests lib honors the
     # HTTP_proxy/HTTPS_proxy variables we set in every process's environment.
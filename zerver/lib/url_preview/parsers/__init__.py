@@ -1,4 +1,5 @@
+from zerver.lib.url_preview.parsers.base import parse_html
 from zerver.lib.url_preview.parsers.generic import GenericParser
 from zerver.lib.url_preview.parsers.open_graph import OpenGraphParser
 
-__all__ = ["GenericParser", "OpenGraphParser"]
+__all__ = ["GenericParser", "OpenGraphParser", "parse_html"]
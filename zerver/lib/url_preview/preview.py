@@ -1,5 +1,7 @@
 import re
 from collections.abc import Callable
+from functools import cache
+from http.cookiejar import DefaultCookiePolicy
 from re import Match
 from typing import Any
 from urllib.parse import urljoin
@@ -10,20 +12,20 @@ from django.conf import settings
 from django.utils.encoding import smart_str
 
 from version import ZULIP_VERSION
-from zerver.lib.cache import cache_with_key, preview_url_cache_key
+from zerver.lib.cache import cache_get_many, cache_with_key, preview_url_cache_key
 from zerver.lib.outgoing_http import OutgoingSession
 from zerver.lib.pysa import mark_sanitized
 from zerver.lib.url_preview.oembed import get_oembed_data
-from zerver.lib.url_preview.parsers import GenericParser, OpenGraphParser
+from zerver.lib.url_preview.parsers import GenericParser, OpenGraphParser, parse_html
 from zerver.lib.url_preview.types import UrlEmbedData, UrlOEmbedData
 
 # Based on django.core.validators.URLValidator, with ftp support removed.
 link_regex = re.compile(
-    r"^(?:http)s?://"  # http:// or https://
+    r"(?:http)s?://"  # http:// or https://
     r"(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|"  # domain...
     r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})"  # ...or ip
     r"(?::\d+)?"  # optional port
-    r"(?:/?|[/?]\S+)$",
+    r"(?:/?|[/?]\S+)",
     re.IGNORECASE,
 )
 
@@ -36,14 +38,38 @@ ZULIP_URL_PREVIEW_USER_AGENT = (
 HEADERS = {"User-Agent": ZULIP_URL_PREVIEW_USER_AGENT}
 TIMEOUT = 15
 
+# The metadata we extract is near the start of a page, so we don't
+# download or parse more than this much of it.
+MAX_PREVIEW_BYTES = 1024 * 1024
+
 
 class PreviewSession(OutgoingSession):
     def __init__(self) -> None:
-        super().__init__(role="preview", timeout=TIMEOUT, headers=HEADERS)
+        # The embed_links worker fetches up to EMBED_LINKS_CONCURRENCY
+        # URLs at once through this session; size the connection pool
+        # to match, so that concurrent fetches don't discard connections.
+        super().__init__(
+            role="preview",
+            timeout=TIMEOUT,
+            headers=HEADERS,
+            pool_maxsize=settings.EMBED_LINKS_CONCURRENCY,
+        )
+        # This session is shared by previews for every user and realm,
+        # so never store cookies that a previewed site sets; otherwise
+        # they'd be sent back on later, unrelated previews of that site.
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+
+@cache
+def get_preview_session() -> PreviewSession:
+    # Share one session across previews, so that its connection pool
+    # can reuse a keep-alive connection once a response on it has been
+    # read to the end, e.g. for a later URL on the same host.
+    return PreviewSession()
 
 
 def is_link(url: str) -> Match[str] | None:
-    return link_regex.match(smart_str(url))
+    return link_regex.fullmatch(smart_str(url))
 
 
 def guess_mimetype_from_content(response: requests.Response) -> str:
@@ -55,21 +81,36 @@ def guess_mimetype_from_content(response: requests.Response) -> str:
     return mime_magic.from_buffer(content)
 
 
+def read_preview_content(response: requests.Response) -> bytes:
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= MAX_PREVIEW_BYTES:
+            break
+    return b"".join(chunks)[:MAX_PREVIEW_BYTES]
+
+
 def valid_content_type(url: str) -> bool:
     try:
-        response = PreviewSession().get(url, stream=True)
+        response = get_preview_session().get(url, stream=True)
     except requests.RequestException:
         return False
 
-    if not response.ok:
-        return False
+    # We only look at the headers and the start of the body; close the
+    # response so that its connection is freed, rather than left
+    # checked out of the session's pool.
+    with response:
+        if not response.ok:
+            return False
 
-    content_type = response.headers.get("content-type")
-    # Be accommodating of bad servers: assume content may be html if no content-type header
-    if not content_type or content_type.startswith("text/html"):
-        # Verify that the content is actually HTML if the server claims it is
-        content_type = guess_mimetype_from_content(response)
-    return content_type.startswith("text/html")
+        content_type = response.headers.get("content-type")
+        # Be accommodating of bad servers: assume content may be html if no content-type header
+        if not content_type or content_type.startswith("text/html"):
+            # Verify that the content is actually HTML if the server claims it is
+            content_type = guess_mimetype_from_content(response)
+        return content_type.startswith("text/html")
 
 
 def catch_network_errors(func: Callable[..., Any]) -> Callable[..., Any]:
@@ -99,17 +140,31 @@ def get_link_embed_data(url: str, maxwidth: int = 640, maxheight: int = 480) ->
     if data is not None and isinstance(data, UrlOEmbedData):
         return data
 
-    response = PreviewSession().get(mark_sanitized(url), stream=True)
-    if not response.ok:
-        return None
+    with get_preview_session().get(mark_sanitized(url), stream=True) as response:
+        if not response.ok:
+            return None
+        html_source = read_preview_content(response)
+        content_type = response.headers.get("Content-Type")
 
     if data is None:
         data = UrlEmbedData()
 
+    # Parse the page once, and share the parsed document between parsers.
+    soup = parse_html(html_source, content_type)
     for parser_class in (OpenGraphParser, GenericParser):
-        parser = parser_class(response.content, response.headers.get("Content-Type"))
+        parser = parser_class(soup)
         data.merge(parser.extract_data())
 
     if data.image:
         data.image = urljoin(response.url, data.image)
     return data
+
+
+def get_cached_link_embed_data(urls: list[str]) -> dict[str, UrlEmbedData | None]:
+    """Looks up the previews that get_link_embed_data has already cached
+    for any of the URLs, in a single cache round trip."""
+    cache_keys = {url: preview_url_cache_key(url) for url in urls}
+    cached = cache_get_many(list(cache_keys.values()))
+    # cache_with_key stores values in singleton tuples, to distinguish
+    # a cached None from a miss.
+    return {url: cached[key][0] for url, key in cache_keys.items() if key in cached}
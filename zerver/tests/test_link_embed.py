@@ -1,5 +1,3 @@
-import re
-from collections import OrderedDict
 from typing import Any
 from unittest import mock
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
@@ -12,18 +10,43 @@ from requests.exceptions import ConnectionError
 from typing_extensions import override
 
 from zerver.actions.message_delete import do_delete_messages
-from zerver.lib.cache import cache_delete, cache_get, preview_url_cache_key
+from zerver.lib.cache import cache_delete, preview_url_cache_key
 from zerver.lib.camo import get_camo_url
 from zerver.lib.queue import queue_json_publish_rollback_unsafe
 from zerver.lib.test_classes import ZulipTestCase
 from zerver.lib.test_helpers import mock_queue_publish
 from zerver.lib.url_preview.oembed import get_oembed_data, strip_cdata
-from zerver.lib.url_preview.parsers import GenericParser, OpenGraphParser
-from zerver.lib.url_preview.preview import get_link_embed_data
+from zerver.lib.url_preview.parsers import GenericParser, OpenGraphParser, parse_html
+from zerver.lib.url_preview.preview import (
+    MAX_PREVIEW_BYTES,
+    get_cached_link_embed_data,
+    get_link_embed_data,
+    get_preview_session,
+)
 from zerver.lib.url_preview.types import UrlEmbedData, UrlOEmbedData
 from zerver.models import Message, Realm, UserMessage, UserProfile
 from zerver.worker.embed_links import FetchLinksEmbedData
 
+# The rendered preview of the Open Graph page that PreviewTestCase
+# serves at http://test.org/; fill in image_url with .format().
+TEST_ORG_PREVIEW_HTML = (
+    '<p><a href="http://test.org/">http://test.org/</a></p>\n'
+    '<div class="message_embed"><a class="message_embed_image" href="http://test.org/"'
+    ' style="background-image: url(&quot;{image_url}&quot;)"></a><div'
+    ' class="data-container"><div class="message_embed_title"><a href="http://test.org/"'
+    ' title="The Rock">The Rock</a></div><div class="message_embed_description">Description'
+    " text</div></div></div>"
+)
+TEST_ORG_WITHOUT_PREVIEW_HTML = '<p><a href="http://test.org/">http://test.org/</a></p>'
+
+# The rendered YouTube video preview that the YouTube tests expect; fill
+# in link_text and image_url with .format().
+YOUTUBE_PREVIEW_HTML = (
+    '<p><a href="https://www.youtube.com/watch?v=eSJTXC7Ixgg">{link_text}</a></p>\n'
+    '<div class="youtube-video message_inline_image"><a data-id="eSJTXC7Ixgg"'
+    ' href="https://www.youtube.com/watch?v=eSJTXC7Ixgg"><img src="{image_url}"></a></div>'
+)
+
 
 def reconstruct_url(url: str, maxwidth: int = 640, maxheight: int = 480) -> str:
     # The following code is taken from
@@ -33,7 +56,7 @@ def reconstruct_url(url: str, maxwidth: int = 640, maxheight: int = 480) -> str:
     oembed_url = provider.oembed_url(url)
     scheme, netloc, path, query_string, fragment = urlsplit(oembed_url)
 
-    query_params = OrderedDict(parse_qsl(query_string))
+    query_params = dict(parse_qsl(query_string))
     query_params["maxwidth"] = str(maxwidth)
     query_params["maxheight"] = str(maxheight)
     final_url = urlunsplit((scheme, netloc, path, urlencode(query_params, True), fragment))
@@ -186,7 +209,7 @@ class OpenGraphParserTestCase(ZulipTestCase):
           </head>
         </html>"""
 
-        parser = OpenGraphParser(html, "text/html; charset=UTF-8")
+        parser = OpenGraphParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.title, "The Rock")
         self.assertEqual(result.description, "The Rock film")
@@ -197,7 +220,7 @@ class OpenGraphParserTestCase(ZulipTestCase):
             <meta property="og:title" content="中文" />
           </head>
         </html>""".encode("big5")
-        parser = OpenGraphParser(html, "text/html; charset=Big5")
+        parser = OpenGraphParser(parse_html(html, "text/html; charset=Big5"))
         result = parser.extract_data()
         self.assertEqual(result.title, "中文")
 
@@ -208,7 +231,7 @@ class OpenGraphParserTestCase(ZulipTestCase):
             <meta property="og:title" content="中文" />
           </head>
         </html>""".encode("big5")
-        parser = OpenGraphParser(html, "text/html")
+        parser = OpenGraphParser(parse_html(html, "text/html"))
         result = parser.extract_data()
         self.assertEqual(result.title, "中文")
 
@@ -224,7 +247,7 @@ class GenericParserTestCase(ZulipTestCase):
             </body>
           </html>
         """
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.title, "Test title")
         self.assertEqual(result.description, "Description text")
@@ -242,7 +265,7 @@ class GenericParserTestCase(ZulipTestCase):
             </body>
           </html>
         """
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.title, "Main header")
         self.assertEqual(result.description, "Description text")
@@ -261,7 +284,7 @@ class GenericParserTestCase(ZulipTestCase):
             </body>
           </html>
         """
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.title, "Main header")
         self.assertEqual(result.description, "Description text")
@@ -279,7 +302,7 @@ class GenericParserTestCase(ZulipTestCase):
             </body>
           </html>
         """
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.description, "Description text")
 
@@ -289,16 +312,17 @@ class GenericParserTestCase(ZulipTestCase):
             <body></body>
           </html>
         """
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertEqual(result.description, "description 123")
 
         html = b"<html><body></body></html>"
-        parser = GenericParser(html, "text/html; charset=UTF-8")
+        parser = GenericParser(parse_html(html, "text/html; charset=UTF-8"))
         result = parser.extract_data()
         self.assertIsNone(result.description)
 
 
+@override_settings(INLINE_URL_EMBED_PREVIEW=True)
 class PreviewTestCase(ZulipTestCase):
     open_graph_html = """
           <html>
@@ -318,9 +342,40 @@ class PreviewTestCase(ZulipTestCase):
           </html>
         """
 
+    # Variants of open_graph_html with the og:image tag removed, with a
+    # bad URL, and without any content.
+    open_graph_image_tag = (
+        '<meta property="og:image" content="http://ia.media-imdb.com/images/rock.jpg" />'
+    )
+    open_graph_html_no_image = open_graph_html.replace(open_graph_image_tag, "")
+    open_graph_html_bad_image_url = open_graph_html.replace(
+        open_graph_image_tag, '<meta property="og:image" content="http://[bad url/" />'
+    )
+    open_graph_html_image_missing_content = open_graph_html.replace(
+        open_graph_image_tag, '<meta property="og:image"/>'
+    )
+
+    worker: FetchLinksEmbedData
+
+    @classmethod
+    @override
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # Creating a worker writes out its queue statistics, so share
+        # one.  The only state it keeps between events is its thread
+        # pool for fetching messages' URLs concurrently.
+        cls.worker = FetchLinksEmbedData()
+
+    @classmethod
+    @override
+    def tearDownClass(cls) -> None:
+        cls.worker.shutdown_executor()
+        super().tearDownClass()
+
+    @classmethod
     @override
-    def setUp(self) -> None:
-        super().setUp()
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
         Realm.objects.all().update(inline_url_embed_preview=True)
 
     @classmethod
@@ -338,8 +393,40 @@ class PreviewTestCase(ZulipTestCase):
             body = body.replace("http://ia.media-imdb.com", "")
         responses.add(responses.GET, url, body=body, status=status, content_type=content_type)
 
+    def get_rendered_content(self, msg_id: int) -> str:
+        rendered_content = (
+            Message.objects.filter(id=msg_id).values_list("rendered_content", flat=True).get()
+        )
+        assert rendered_content is not None
+        return rendered_content
+
+    def send_stream_message_with_embed_event(
+        self, user: UserProfile, content: str, topic_name: str = "foo"
+    ) -> tuple[int, dict[str, Any]]:
+        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
+            msg_id = self.send_stream_message(
+                user, "Denmark", topic_name=topic_name, content=content
+            )
+            patched.assert_called_once()
+            queue = patched.call_args[0][0]
+            self.assertEqual(queue, "embed_links")
+            event = patched.call_args[0][1]
+        return msg_id, event
+
+    def assert_fetch_logged(self, output: list[str], url: str) -> None:
+        self.assertTrue(
+            output[0].startswith(f"INFO:root:Time spent on get_link_embed_data for {url}: ")
+        )
+
+    def get_user_message_flags(self, msg_id: int) -> dict[int, int]:
+        return {
+            user_profile_id: int(flags)
+            for user_profile_id, flags in UserMessage.objects.filter(message_id=msg_id).values_list(
+                "user_profile_id", "flags"
+            )
+        }
+
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_edit_message_history(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
@@ -363,19 +450,13 @@ class PreviewTestCase(ZulipTestCase):
 
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
         embedded_link = f'<a href="{url}" title="The Rock">The Rock</a>'
-        msg = Message.objects.select_related("sender").get(id=msg_id)
-        assert msg.rendered_content is not None
-        self.assertIn(embedded_link, msg.rendered_content)
+        self.assertIn(embedded_link, self.get_rendered_content(msg_id))
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def _send_message_with_test_org_url(
         self,
         sender: UserProfile,
@@ -401,42 +482,31 @@ class PreviewTestCase(ZulipTestCase):
                 patched.assert_not_called()
                 # If we nothing was put in the queue, we don't need to
                 # run the queue processor or any of the following code
-                return Message.objects.select_related("sender").get(id=msg_id)
+                return Message.objects.get(id=msg_id)
 
         # Verify the initial message doesn't have the embedded links rendered
-        msg = Message.objects.select_related("sender").get(id=msg_id)
-        assert msg.rendered_content is not None
-        self.assertNotIn(f'<a href="{url}" title="The Rock">The Rock</a>', msg.rendered_content)
+        self.assertNotIn(
+            f'<a href="{url}" title="The Rock">The Rock</a>', self.get_rendered_content(msg_id)
+        )
 
         self.create_mock_response(url, relative_url=relative_url)
 
         # Run the queue processor to potentially rerender things
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         return msg
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_message_update_race_condition(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         original_url = "http://test.org/"
         edited_url = "http://edited.org/"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(
-                user, "Denmark", topic_name="foo", content=original_url
-            )
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, original_url)
 
         def wrapped_queue_event_on_commit(*args: Any, **kwargs: Any) -> None:
             self.create_mock_response(original_url)
@@ -445,17 +515,13 @@ class PreviewTestCase(ZulipTestCase):
             with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
                 # Run the queue processor. This will simulate the event for original_url being
                 # processed after the message has been edited.
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
-            msg = Message.objects.select_related("sender").get(id=msg_id)
-            assert msg.rendered_content is not None
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
             # The content of the message has changed since the event for original_url has been created,
             # it should not be rendered. Another, up-to-date event will have been sent (edited_url).
             self.assertNotIn(
-                f'<a href="{original_url}" title="The Rock">The Rock</a>', msg.rendered_content
+                f'<a href="{original_url}" title="The Rock">The Rock</a>',
+                self.get_rendered_content(msg_id),
             )
 
             self.assertTrue(responses.assert_call_count(edited_url, 0))
@@ -464,16 +530,11 @@ class PreviewTestCase(ZulipTestCase):
                 # Now proceed with the original queue_json_publish_rollback_unsafe
                 # and call the up-to-date event for edited_url.
                 queue_json_publish_rollback_unsafe(*args, **kwargs)
-                msg = Message.objects.select_related("sender").get(id=msg_id)
-                assert msg.rendered_content is not None
                 self.assertIn(
                     f'<a href="{edited_url}" title="The Rock">The Rock</a>',
-                    msg.rendered_content,
+                    self.get_rendered_content(msg_id),
                 )
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://edited.org/: "
-                in info_logs.output[0]
-            )
+            self.assert_fetch_logged(info_logs.output, "http://edited.org/")
 
         with mock_queue_publish(
             "zerver.actions.message_edit.queue_event_on_commit", wraps=wrapped_queue_event_on_commit
@@ -487,19 +548,13 @@ class PreviewTestCase(ZulipTestCase):
             self.assert_json_success(result)
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_message_deleted(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.select_related("realm").get(id=msg_id)
         do_delete_messages(msg.realm, [msg], acting_user=None)
 
         # We do still fetch the URL, as we don't want to incur the
@@ -508,56 +563,97 @@ class PreviewTestCase(ZulipTestCase):
         with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
             # Run the queue processor. This will simulate the event for original_url being
             # processed after the message has been deleted.
-            FetchLinksEmbedData().consume(event)
-        self.assertTrue(
-            "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-            in info_logs.output[0]
+            self.worker.consume(event)
+        self.assert_fetch_logged(info_logs.output, "http://test.org/")
+
+    @responses.activate
+    def test_fetch_multiple_urls(self) -> None:
+        user = self.example_user("hamlet")
+        self.login_user(user)
+        urls = ["http://test.org/", "http://test.org/foo.html"]
+        _, event = self.send_stream_message_with_embed_event(user, " ".join(urls))
+        self.assertEqual(sorted(event["urls"]), urls)
+
+        for url in urls:
+            self.create_mock_response(url)
+        with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
+            # The URLs are fetched concurrently.
+            self.worker.consume(event)
+            cached_data = get_cached_link_embed_data(urls)
+
+        self.assertEqual(
+            sorted(line.split(": ")[0] for line in info_logs.output),
+            [f"INFO:root:Time spent on get_link_embed_data for {url}" for url in urls],
         )
+        for url in urls:
+            data = cached_data[url]
+            assert data is not None
+            self.assertEqual(data.title, "The Rock")
+
+    @responses.activate
+    def test_fetch_multiple_urls_partly_cached(self) -> None:
+        user = self.example_user("hamlet")
+        self.login_user(user)
+        cached_url, fetched_url = "http://test.org/", "http://test.org/foo.html"
+        msg_id, event = self.send_stream_message_with_embed_event(
+            user, f"{cached_url} {fetched_url}"
+        )
+
+        for url in (cached_url, fetched_url):
+            self.create_mock_response(url)
+        with self.settings(TEST_SUITE=False):
+            get_link_embed_data(cached_url)
+        # The number of requests it takes to preview one of these URLs.
+        calls_per_url = len(responses.calls)
+
+        with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
+            self.worker.consume(event)
+
+        # Only the URL which wasn't cached yet is fetched.
+        self.assertTrue(responses.assert_call_count(cached_url, calls_per_url))
+        self.assertTrue(responses.assert_call_count(fetched_url, calls_per_url))
+        self.assert_length(info_logs.output, 1)
+        self.assert_fetch_logged(info_logs.output, fetched_url)
+
+        rendered_content = self.get_rendered_content(msg_id)
+        for url in (cached_url, fetched_url):
+            self.assertIn(f'<a href="{url}" title="The Rock">The Rock</a>', rendered_content)
 
     def test_mentions_preserved(self) -> None:
         # Updating the message with the preview content should be sure
         # to preserve the mention data.
+        hamlet = self.example_user("hamlet")
+        cordelia = self.example_user("cordelia")
         msg = self._send_message_with_test_org_url(
-            sender=self.example_user("hamlet"),
+            sender=hamlet,
             other_content=" @**Cordelia, Lear's daughter** mention",
         )
+        flags = self.get_user_message_flags(msg.id)
         self.assertEqual(
-            int(
-                UserMessage.objects.get(message=msg, user_profile=self.example_user("hamlet")).flags
-            ),
+            flags[hamlet.id],
             int(UserMessage.flags.read | UserMessage.flags.is_private),
         )
         self.assertEqual(
-            int(
-                UserMessage.objects.get(
-                    message=msg, user_profile=self.example_user("cordelia")
-                ).flags
-            ),
+            flags[cordelia.id],
             int(UserMessage.flags.mentioned | UserMessage.flags.is_private),
         )
 
         msg = self._send_message_with_test_org_url(
-            sender=self.example_user("hamlet"), other_content=" @*hamletcharacters* mention"
+            sender=hamlet, other_content=" @*hamletcharacters* mention"
         )
+        flags = self.get_user_message_flags(msg.id)
         self.assertEqual(
-            int(
-                UserMessage.objects.get(message=msg, user_profile=self.example_user("hamlet")).flags
-            ),
+            flags[hamlet.id],
             int(
                 UserMessage.flags.mentioned | UserMessage.flags.read | UserMessage.flags.is_private
             ),
         )
         self.assertEqual(
-            int(
-                UserMessage.objects.get(
-                    message=msg, user_profile=self.example_user("cordelia")
-                ).flags
-            ),
+            flags[cordelia.id],
             int(UserMessage.flags.mentioned | UserMessage.flags.is_private),
         )
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_topic_wildcard_mention_preserved(self) -> None:
         url = "http://test.org/"
         cache_delete(preview_url_cache_key(url))
@@ -565,44 +661,35 @@ class PreviewTestCase(ZulipTestCase):
         cordelia = self.example_user("cordelia")
         self.subscribe(hamlet, "Denmark")
         self.subscribe(cordelia, "Denmark")
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(
-                hamlet,
-                "Denmark",
-                topic_name="test",
-                content=url + " @**topic**",
-            )
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(
+            hamlet, url + " @**topic**", topic_name="test"
+        )
 
+        flags = self.get_user_message_flags(msg_id)
         # Hamlet sent the message, so he is a topic participant.
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=hamlet).flags),
+            flags[hamlet.id],
             int(UserMessage.flags.topic_wildcard_mentioned | UserMessage.flags.read),
         )
         # Cordelia is not a participant in the topic
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=cordelia).flags),
+            flags[cordelia.id],
             0,
         )
 
         self.create_mock_response(url)
         with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
-            FetchLinksEmbedData().consume(event)
-        self.assertTrue(
-            "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-            in info_logs.output[0]
-        )
+            self.worker.consume(event)
+        self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
         # The topic wildcard mention flag must be preserved.
+        flags = self.get_user_message_flags(msg_id)
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=hamlet).flags),
+            flags[hamlet.id],
             int(UserMessage.flags.topic_wildcard_mentioned | UserMessage.flags.read),
         )
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=cordelia).flags),
+            flags[cordelia.id],
             0,
         )
 
@@ -610,13 +697,14 @@ class PreviewTestCase(ZulipTestCase):
         msg_id = self.send_stream_message(
             cordelia, "Denmark", topic_name="test", content=" @**topic**"
         )
+        flags = self.get_user_message_flags(msg_id)
         # Both Hamlet and Cordelia are topic participants.
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=hamlet).flags),
+            flags[hamlet.id],
             int(UserMessage.flags.topic_wildcard_mentioned),
         )
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=cordelia).flags),
+            flags[cordelia.id],
             int(UserMessage.flags.topic_wildcard_mentioned | UserMessage.flags.read),
         )
 
@@ -636,19 +724,17 @@ class PreviewTestCase(ZulipTestCase):
 
         self.create_mock_response(url)
         with self.settings(TEST_SUITE=False), self.assertLogs(level="INFO") as info_logs:
-            FetchLinksEmbedData().consume(event)
-        self.assertTrue(
-            "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-            in info_logs.output[0]
-        )
+            self.worker.consume(event)
+        self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
         # The topic wildcard mention flag must be preserved.
+        flags = self.get_user_message_flags(msg_id)
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=hamlet).flags),
+            flags[hamlet.id],
             int(UserMessage.flags.topic_wildcard_mentioned),
         )
         self.assertEqual(
-            int(UserMessage.objects.get(message_id=msg_id, user_profile=cordelia).flags),
+            flags[cordelia.id],
             int(UserMessage.flags.topic_wildcard_mentioned | UserMessage.flags.read),
         )
 
@@ -673,8 +759,9 @@ class PreviewTestCase(ZulipTestCase):
 
     @override_settings(CAMO_URI="")
     def test_inline_url_embed_preview(self) -> None:
-        with_preview = '<p><a href="http://test.org/">http://test.org/</a></p>\n<div class="message_embed"><a class="message_embed_image" href="http://test.org/" style="background-image: url(&quot;http://ia.media-imdb.com/images/rock.jpg&quot;)"></a><div class="data-container"><div class="message_embed_title"><a href="http://test.org/" title="The Rock">The Rock</a></div><div class="message_embed_description">Description text</div></div></div>'
-        without_preview = '<p><a href="http://test.org/">http://test.org/</a></p>'
+        with_preview = TEST_ORG_PREVIEW_HTML.format(
+            image_url="http://ia.media-imdb.com/images/rock.jpg"
+        )
         msg = self._send_message_with_test_org_url(sender=self.example_user("hamlet"))
         self.assertEqual(msg.rendered_content, with_preview)
 
@@ -685,52 +772,34 @@ class PreviewTestCase(ZulipTestCase):
         msg = self._send_message_with_test_org_url(
             sender=self.example_user("prospero"), queue_should_run=False
         )
-        self.assertEqual(msg.rendered_content, without_preview)
+        self.assertEqual(msg.rendered_content, TEST_ORG_WITHOUT_PREVIEW_HTML)
 
     def test_inline_url_embed_preview_with_camo(self) -> None:
-        camo_url = get_camo_url("http://ia.media-imdb.com/images/rock.jpg")
-        with_preview = (
-            '<p><a href="http://test.org/">http://test.org/</a></p>\n<div class="message_embed"><a class="message_embed_image" href="http://test.org/" style="background-image: url(&quot;'
-            + camo_url
-            + '&quot;)"></a><div class="data-container"><div class="message_embed_title"><a href="http://test.org/" title="The Rock">The Rock</a></div><div class="message_embed_description">Description text</div></div></div>'
+        with_preview = TEST_ORG_PREVIEW_HTML.format(
+            image_url=get_camo_url("http://ia.media-imdb.com/images/rock.jpg")
         )
         msg = self._send_message_with_test_org_url(sender=self.example_user("hamlet"))
         self.assertEqual(msg.rendered_content, with_preview)
 
     @responses.activate
     @override_settings(CAMO_URI="")
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_css_escaping_image(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
         # Swap the URL out for one with characters that need CSS escaping
-        html = re.sub(r"rock\.jpg", r"rock.jpg\\", self.open_graph_html)
+        html = self.open_graph_html.replace("rock.jpg", "rock.jpg\\")
         self.create_mock_response(url, body=html)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
-        msg = Message.objects.select_related("sender").get(id=msg_id)
-        with_preview = (
-            '<p><a href="http://test.org/">http://test.org/</a></p>\n'
-            '<div class="message_embed"><a class="message_embed_image" href="http://test.org/"'
-            ' style="background-image:'
-            ' url(&quot;http://ia.media-imdb.com/images/rock.jpg\\\\&quot;)"></a><div'
-            ' class="data-container"><div class="message_embed_title"><a href="http://test.org/"'
-            ' title="The Rock">The Rock</a></div><div class="message_embed_description">Description'
-            " text</div></div></div>"
+        msg = Message.objects.get(id=msg_id)
+        with_preview = TEST_ORG_PREVIEW_HTML.format(
+            image_url="http://ia.media-imdb.com/images/rock.jpg\\\\"
         )
         self.assertEqual(
             with_preview,
@@ -738,7 +807,6 @@ class PreviewTestCase(ZulipTestCase):
         )
 
     @override_settings(CAMO_URI="")
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_inline_relative_url_embed_preview(self) -> None:
         # Relative URLs should not be sent for URL preview.
         with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
@@ -751,7 +819,9 @@ class PreviewTestCase(ZulipTestCase):
 
     @override_settings(CAMO_URI="")
     def test_inline_url_embed_preview_with_relative_image_url(self) -> None:
-        with_preview_relative = '<p><a href="http://test.org/">http://test.org/</a></p>\n<div class="message_embed"><a class="message_embed_image" href="http://test.org/" style="background-image: url(&quot;http://test.org/images/rock.jpg&quot;)"></a><div class="data-container"><div class="message_embed_title"><a href="http://test.org/" title="The Rock">The Rock</a></div><div class="message_embed_description">Description text</div></div></div>'
+        with_preview_relative = TEST_ORG_PREVIEW_HTML.format(
+            image_url="http://test.org/images/rock.jpg"
+        )
         # Try case where the Open Graph image is a relative URL.
         msg = self._send_message_with_test_org_url(
             sender=self.example_user("prospero"), relative_url=True
@@ -761,180 +831,170 @@ class PreviewTestCase(ZulipTestCase):
     @responses.activate
     def test_http_error_get_data(self) -> None:
         url = "http://test.org/"
-        msg_id = self.send_personal_message(
-            self.example_user("hamlet"),
-            self.example_user("cordelia"),
-            content=url,
-        )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit"):
+            msg_id = self.send_personal_message(
+                self.example_user("hamlet"),
+                self.example_user("cordelia"),
+                content=url,
+            )
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": url,
         }
 
         self.create_mock_response(url, body=ConnectionError())
 
-        with self.settings(INLINE_URL_EMBED_PREVIEW=True, TEST_SUITE=False):
+        with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
-        msg = Message.objects.get(id=msg_id)
+        msg.refresh_from_db(fields=["rendered_content"])
         self.assertEqual(
             '<p><a href="http://test.org/">http://test.org/</a></p>', msg.rendered_content
         )
 
     def test_invalid_link(self) -> None:
-        with self.settings(INLINE_URL_EMBED_PREVIEW=True, TEST_SUITE=False):
+        with self.settings(TEST_SUITE=False):
             self.assertIsNone(get_link_embed_data("com.notvalidlink"))
             self.assertIsNone(get_link_embed_data("μένει.com.notvalidlink"))
+            # The whole string must be a URL, including any trailing newline.
+            self.assertIsNone(get_link_embed_data("http://test.org/\n"))
+
+    @responses.activate
+    def test_link_preview_large_page(self) -> None:
+        url = "http://test.org/"
+        # Anything past the first MAX_PREVIEW_BYTES of the page is
+        # neither downloaded nor parsed.
+        html = self.open_graph_html.replace(
+            "</body>",
+            " " * MAX_PREVIEW_BYTES
+            + '<meta property="og:description" content="Past the limit" /></body>',
+        )
+        self.create_mock_response(url, body=html)
+        with (
+            mock.patch("zerver.lib.url_preview.preview.get_oembed_data", return_value=None),
+            self.settings(TEST_SUITE=False),
+        ):
+            data = get_link_embed_data(url)
+        assert data is not None
+        self.assertEqual(data.title, "The Rock")
+        self.assertEqual(data.description, "Description text")
+
+    @responses.activate
+    def test_link_preview_ignores_cookies(self) -> None:
+        url = "http://test.org/"
+        responses.add(
+            responses.GET,
+            url,
+            body=self.open_graph_html,
+            content_type="text/html",
+            headers={"Set-Cookie": "tracking=1; Path=/"},
+        )
+        with (
+            mock.patch("zerver.lib.url_preview.preview.get_oembed_data", return_value=None),
+            self.settings(TEST_SUITE=False),
+        ):
+            data = get_link_embed_data(url)
+        assert data is not None
+        self.assertEqual(data.title, "The Rock")
+        # The preview session is shared across users and realms, so it
+        # must not keep cookies set by previewed sites.
+        self.assertEqual(len(get_preview_session().cookies), 0)
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_non_html_data(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/audio.mp3"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
         content_type = "application/octet-stream"
         self.create_mock_response(url, content_type=content_type)
 
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/audio.mp3: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/audio.mp3")
 
         self.assertIsNone(cached_data)
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         self.assertEqual(
             '<p><a href="http://test.org/audio.mp3">http://test.org/audio.mp3</a></p>',
             msg.rendered_content,
         )
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_no_open_graph_image(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/foo.html"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
         # HTML without the og:image metadata
-        html = "\n".join(
-            line for line in self.open_graph_html.splitlines() if "og:image" not in line
-        )
-        self.create_mock_response(url, body=html)
+        self.create_mock_response(url, body=self.open_graph_html_no_image)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/foo.html: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/foo.html")
 
         assert cached_data is not None
         self.assertIsNotNone(cached_data.title)
         self.assertIsNone(cached_data.image)
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         self.assertEqual(
             '<p><a href="http://test.org/foo.html">http://test.org/foo.html</a></p>',
             msg.rendered_content,
         )
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_open_graph_image_bad_url(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/foo.html"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
         # HTML with a bad og:image metadata
-        html = "\n".join(
-            (
-                line
-                if "og:image" not in line
-                else '<meta property="og:image" content="http://[bad url/" />'
-            )
-            for line in self.open_graph_html.splitlines()
-        )
-        self.create_mock_response(url, body=html)
+        self.create_mock_response(url, body=self.open_graph_html_bad_image_url)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/foo.html: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/foo.html")
 
         assert cached_data is not None
         self.assertIsNotNone(cached_data.title)
         self.assertIsNone(cached_data.image)
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         self.assertEqual(
             '<p><a href="http://test.org/foo.html">http://test.org/foo.html</a></p>',
             msg.rendered_content,
         )
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_open_graph_image_missing_content(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/foo.html"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
-        # HTML without the og:image metadata
-        html = "\n".join(
-            line if "og:image" not in line else '<meta property="og:image"/>'
-            for line in self.open_graph_html.splitlines()
-        )
-        self.create_mock_response(url, body=html)
+        # HTML with an og:image tag that has no content
+        self.create_mock_response(url, body=self.open_graph_html_image_missing_content)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/foo.html: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/foo.html")
 
         assert cached_data is not None
         self.assertIsNotNone(cached_data.title)
         self.assertIsNone(cached_data.image)
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         self.assertEqual(
             '<p><a href="http://test.org/foo.html">http://test.org/foo.html</a></p>',
             msg.rendered_content,
@@ -942,37 +1002,26 @@ class PreviewTestCase(ZulipTestCase):
 
     @responses.activate
     @override_settings(CAMO_URI="")
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_link_preview_no_content_type_header(self) -> None:
         user = self.example_user("hamlet")
         self.login_user(user)
         url = "http://test.org/"
-        with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit") as patched:
-            msg_id = self.send_stream_message(user, "Denmark", topic_name="foo", content=url)
-            patched.assert_called_once()
-            queue = patched.call_args[0][0]
-            self.assertEqual(queue, "embed_links")
-            event = patched.call_args[0][1]
+        msg_id, event = self.send_stream_message_with_embed_event(user, url)
 
         self.create_mock_response(url)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
         assert cached_data is not None
-        msg = Message.objects.select_related("sender").get(id=msg_id)
-        assert msg.rendered_content is not None
-        self.assertIn(cached_data.title, msg.rendered_content)
+        rendered_content = self.get_rendered_content(msg_id)
+        self.assertIn(cached_data.title, rendered_content)
         assert cached_data.image is not None
-        self.assertIn(cached_data.image, msg.rendered_content)
+        self.assertIn(cached_data.image, rendered_content)
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_valid_content_type_error_get_data(self) -> None:
         url = "http://test.org/"
         with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit"):
@@ -981,11 +1030,11 @@ class PreviewTestCase(ZulipTestCase):
                 self.example_user("cordelia"),
                 content=url,
             )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": url,
         }
 
@@ -994,31 +1043,24 @@ class PreviewTestCase(ZulipTestCase):
         with (
             mock.patch(
                 "zerver.lib.url_preview.preview.get_oembed_data",
-                side_effect=lambda *args, **kwargs: None,
-            ),
-            mock.patch(
-                "zerver.lib.url_preview.preview.valid_content_type", side_effect=lambda k: True
+                return_value=None,
             ),
+            mock.patch("zerver.lib.url_preview.preview.valid_content_type", return_value=True),
             self.settings(TEST_SUITE=False),
         ):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
-            # This did not get cached -- hence the lack of [0] on the cache_get
-            cached_data = cache_get(preview_url_cache_key(url))
-            self.assertIsNone(cached_data)
+            # This did not get cached
+            self.assertNotIn(url, get_cached_link_embed_data([url]))
 
-        msg.refresh_from_db()
+        msg.refresh_from_db(fields=["rendered_content"])
         self.assertEqual(
             '<p><a href="http://test.org/">http://test.org/</a></p>', msg.rendered_content
         )
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_invalid_url(self) -> None:
         url = "http://test.org/"
         error_url = "http://test.org/x"
@@ -1028,35 +1070,31 @@ class PreviewTestCase(ZulipTestCase):
                 self.example_user("cordelia"),
                 content=error_url,
             )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [error_url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": error_url,
         }
 
         self.create_mock_response(error_url, status=404)
         with self.settings(TEST_SUITE=False):
             with self.assertLogs(level="INFO") as info_logs:
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/x: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+            self.assert_fetch_logged(info_logs.output, "http://test.org/x")
 
             # FIXME: Should we really cache this, especially without cache invalidation?
-            cached_data = cache_get(preview_url_cache_key(error_url))[0]
+            cached_data = get_cached_link_embed_data([error_url])[error_url]
 
         self.assertIsNone(cached_data)
-        msg.refresh_from_db()
+        msg.refresh_from_db(fields=["rendered_content"])
         self.assertEqual(
             '<p><a href="http://test.org/x">http://test.org/x</a></p>', msg.rendered_content
         )
         self.assertTrue(responses.assert_call_count(url, 0))
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_safe_oembed_html_url(self) -> None:
         url = "http://test.org/"
         with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit"):
@@ -1065,11 +1103,11 @@ class PreviewTestCase(ZulipTestCase):
                 self.example_user("cordelia"),
                 content=url,
             )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": url,
         }
 
@@ -1084,23 +1122,19 @@ class PreviewTestCase(ZulipTestCase):
                 self.assertLogs(level="INFO") as info_logs,
                 mock.patch(
                     "zerver.lib.url_preview.preview.get_oembed_data",
-                    lambda *args, **kwargs: mocked_data,
+                    return_value=mocked_data,
                 ),
             ):
-                FetchLinksEmbedData().consume(event)
-                cached_data = cache_get(preview_url_cache_key(url))[0]
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for http://test.org/: "
-                in info_logs.output[0]
-            )
+                self.worker.consume(event)
+                cached_data = get_cached_link_embed_data([url])[url]
+            self.assert_fetch_logged(info_logs.output, "http://test.org/")
 
         self.assertEqual(cached_data, mocked_data)
-        msg.refresh_from_db()
+        msg.refresh_from_db(fields=["rendered_content"])
         assert msg.rendered_content is not None
         self.assertIn(f'a data-id="{escape(mocked_data.html)}"', msg.rendered_content)
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_youtube_url_title_replaces_url(self) -> None:
         url = "https://www.youtube.com/watch?v=eSJTXC7Ixgg"
         with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit"):
@@ -1109,11 +1143,11 @@ class PreviewTestCase(ZulipTestCase):
                 self.example_user("cordelia"),
                 content=url,
             )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": url,
         }
 
@@ -1126,21 +1160,22 @@ class PreviewTestCase(ZulipTestCase):
                 self.assertLogs(level="INFO") as info_logs,
                 mock.patch(
                     "zerver.worker.embed_links.url_preview.get_link_embed_data",
-                    lambda *args, **kwargs: mocked_data,
+                    return_value=mocked_data,
                 ),
             ):
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for https://www.youtube.com/watch?v=eSJTXC7Ixgg:"
-                in info_logs.output[0]
+                self.worker.consume(event)
+            self.assert_fetch_logged(
+                info_logs.output, "https://www.youtube.com/watch?v=eSJTXC7Ixgg"
             )
 
-        msg.refresh_from_db()
-        expected_content = f"""<p><a href="https://www.youtube.com/watch?v=eSJTXC7Ixgg">YouTube - Clearer Code at Scale - Static Types at Zulip and Dropbox</a></p>\n<div class="youtube-video message_inline_image"><a data-id="eSJTXC7Ixgg" href="https://www.youtube.com/watch?v=eSJTXC7Ixgg"><img src="{get_camo_url("https://i.ytimg.com/vi/eSJTXC7Ixgg/mqdefault.jpg")}"></a></div>"""
+        msg.refresh_from_db(fields=["rendered_content"])
+        expected_content = YOUTUBE_PREVIEW_HTML.format(
+            link_text="YouTube - Clearer Code at Scale - Static Types at Zulip and Dropbox",
+            image_url=get_camo_url("https://i.ytimg.com/vi/eSJTXC7Ixgg/mqdefault.jpg"),
+        )
         self.assertEqual(expected_content, msg.rendered_content)
 
     @responses.activate
-    @override_settings(INLINE_URL_EMBED_PREVIEW=True)
     def test_custom_title_replaces_youtube_url_title(self) -> None:
         url = "[YouTube link](https://www.youtube.com/watch?v=eSJTXC7Ixgg)"
         with mock_queue_publish("zerver.actions.message_send.queue_event_on_commit"):
@@ -1149,11 +1184,11 @@ class PreviewTestCase(ZulipTestCase):
                 self.example_user("cordelia"),
                 content=url,
             )
-        msg = Message.objects.select_related("sender").get(id=msg_id)
+        msg = Message.objects.get(id=msg_id)
         event = {
             "message_id": msg_id,
             "urls": [url],
-            "message_realm_id": msg.sender.realm_id,
+            "message_realm_id": msg.realm_id,
             "message_content": url,
         }
 
@@ -1166,15 +1201,17 @@ class PreviewTestCase(ZulipTestCase):
                 self.assertLogs(level="INFO") as info_logs,
                 mock.patch(
                     "zerver.worker.embed_links.url_preview.get_link_embed_data",
-                    lambda *args, **kwargs: mocked_data,
+                    return_value=mocked_data,
                 ),
             ):
-                FetchLinksEmbedData().consume(event)
-            self.assertTrue(
-                "INFO:root:Time spent on get_link_embed_data for [YouTube link](https://www.youtube.com/watch?v=eSJTXC7Ixgg):"
-                in info_logs.output[0]
+                self.worker.consume(event)
+            self.assert_fetch_logged(
+                info_logs.output, "[YouTube link](https://www.youtube.com/watch?v=eSJTXC7Ixgg)"
             )
 
-        msg.refresh_from_db()
-        expected_content = f"""<p><a href="https://www.youtube.com/watch?v=eSJTXC7Ixgg">YouTube link</a></p>\n<div class="youtube-video message_inline_image"><a data-id="eSJTXC7Ixgg" href="https://www.youtube.com/watch?v=eSJTXC7Ixgg"><img src="{get_camo_url("https://i.ytimg.com/vi/eSJTXC7Ixgg/mqdefault.jpg")}"></a></div>"""
+        msg.refresh_from_db(fields=["rendered_content"])
+        expected_content = YOUTUBE_PREVIEW_HTML.format(
+            link_text="YouTube link",
+            image_url=get_camo_url("https://i.ytimg.com/vi/eSJTXC7Ixgg/mqdefault.jpg"),
+        )
         self.assertEqual(expected_content, msg.rendered_content)
@@ -157,6 +157,20 @@ class TestOutgoingHttp(ZulipTestCase):
         assert isinstance(session.adapters["https://"], HTTPAdapter)
         self.assertEqual(session.adapters["https://"].max_retries.total, 5)
 
+    def test_pool_maxsize(self) -> None:
+        session = OutgoingSession(role="testing", timeout=1)
+        assert isinstance(session.adapters["https://"], HTTPAdapter)
+        self.assertEqual(
+            session.adapters["https://"].poolmanager.connection_pool_kw["maxsize"],
+            requests.adapters.DEFAULT_POOLSIZE,
+        )
+
+        session = OutgoingSession(role="testing", timeout=1, pool_maxsize=32)
+        assert isinstance(session.adapters["http://"], HTTPAdapter)
+        self.assertEqual(session.adapters["http://"].poolmanager.connection_pool_kw["maxsize"], 32)
+        assert isinstance(session.adapters["https://"], HTTPAdapter)
+        self.assertEqual(session.adapters["https://"].poolmanager.connection_pool_kw["maxsize"], 32)
+
 
 class TestBoto3SmokescreenBypass(ZulipTestCase):
     # boto3 is set up at startup to bypass the Smokescreen proxy; see
@@ -1,6 +1,7 @@
 import base64
 import os
 import signal
+import threading
 import time
 from collections import defaultdict
 from collections.abc import Callable, Iterator, Mapping
@@ -819,6 +820,50 @@ class WorkerTest(ZulipTestCase):
                     "Timed out in timeout_worker after 1 seconds while fetching URLs for message 15: ['first', 'second']",
                 )
 
+    @override_settings(EMBED_LINKS_CONCURRENCY=1)
+    def test_embed_links_timeout_does_not_block_next_event(self) -> None:
+        @base_worker.assign_queue("timeout_worker", is_test_queue=True)
+        class TimeoutWorker(FetchLinksEmbedData):
+            MAX_CONSUME_SECONDS = 1
+
+        main_thread_id = threading.get_ident()
+        hung_fetch = threading.Event()
+        fetched = []
+
+        def fetch_link_embed_data(url: str) -> None:
+            fetched.append(url)
+            if url == "first":
+                # Time out while this fetch is still running in the
+                # pool's only thread, and keep it running.
+                signal.pthread_kill(main_thread_id, signal.SIGALRM)
+                hung_fetch.wait(timeout=10)
+
+        fake_client = FakeClient()
+        fake_client.enqueue("timeout_worker", {"message_id": 15, "urls": ["first", "second"]})
+        fake_client.enqueue("timeout_worker", {"message_id": 16, "urls": ["third", "fourth"]})
+
+        with (
+            simulated_queue_client(fake_client),
+            patch("zerver.worker.embed_links.fetch_link_embed_data", fetch_link_embed_data),
+        ):
+            worker = TimeoutWorker()
+            worker.setup()
+            try:
+                with self.assertLogs(level="WARNING") as m:
+                    worker.start()
+            finally:
+                hung_fetch.set()
+                worker.shutdown_executor()
+
+        # Only the first event timed out; the second got fresh threads.
+        self.assertEqual(
+            m.output,
+            [
+                "WARNING:root:Timed out in timeout_worker after 1 seconds while fetching URLs for message 15: ['first', 'second']"
+            ],
+        )
+        self.assertEqual(fetched, ["first", "third", "fourth"])
+
     def test_worker_noname(self) -> None:
         class TestWorker(base_worker.QueueProcessingWorker):
             def __init__(self) -> None:
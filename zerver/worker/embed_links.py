@@ -2,9 +2,11 @@
 import logging
 import time
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from types import FrameType
 from typing import Any
 
+from django.conf import settings
 from django.db import transaction
 from typing_extensions import override
 
@@ -19,21 +21,63 @@ from zerver.worker.base import InterruptConsumeError, QueueProcessingWorker, ass
 logger = logging.getLogger(__name__)
 
 
+def fetch_link_embed_data(url: str) -> UrlEmbedData | None:
+    start_time = time.time()
+    url_embed_data = url_preview.get_link_embed_data(url)
+    logging.info("Time spent on get_link_embed_data for %s: %s", url, time.time() - start_time)
+    return url_embed_data
+
+
 @assign_queue("embed_links")
 class FetchLinksEmbedData(QueueProcessingWorker):
     # This is a slow queue with network requests, so a disk write is negligible.
     # Update stats file after every consume call.
     CONSUME_ITERATIONS_BEFORE_UPDATE_STATS_NUM = 1
 
+    executor: ThreadPoolExecutor | None = None
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        # Keep the same threads across events, so that the memcached
+        # connections they each open (one per thread) are reused too.
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.EMBED_LINKS_CONCURRENCY, thread_name_prefix="embed_links"
+            )
+        return self.executor
+
+    def shutdown_executor(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
     @override
     def consume(self, event: Mapping[str, Any]) -> None:
         url_embed_data: dict[str, UrlEmbedData | None] = {}
-        for url in event["urls"]:
-            start_time = time.time()
-            url_embed_data[url] = url_preview.get_link_embed_data(url)
-            logging.info(
-                "Time spent on get_link_embed_data for %s: %s", url, time.time() - start_time
-            )
+        urls = event["urls"]
+        if len(urls) > 1:
+            # get_link_embed_data caches its results; for a message
+            # with several links, look them all up in a single cache
+            # round trip, and only fetch the rest.
+            url_embed_data = url_preview.get_cached_link_embed_data(urls)
+            urls = [url for url in urls if url not in url_embed_data]
+
+        if len(urls) <= 1:
+            url_embed_data.update((url, fetch_link_embed_data(url)) for url in urls)
+        else:
+            # Fetching previews is dominated by waiting on the network,
+            # so the URLs in a message with several links are fetched
+            # concurrently.
+            try:
+                results = self.get_executor().map(fetch_link_embed_data, urls)
+                url_embed_data.update(zip(urls, results, strict=True))
+            except InterruptConsumeError:
+                # The timeout's SIGALRM only interrupts this thread, so
+                # fetches already running in the pool carry on, and
+                # would hold up the next events.  Leave those threads
+                # to finish on their own, and start a fresh pool for
+                # the next event.
+                self.shutdown_executor()
+                raise
 
         # Ideally, we should use `durable=True` here. However, in the
         # `test_message_update_race_condition` test, this function is not called
@@ -72,6 +116,13 @@ class FetchLinksEmbedData(QueueProcessingWorker):
             )
             do_update_embedded_data(message.sender, message, rendering_result, mention_data)
 
+    @override
+    def stop(self) -> None:  # nocoverage
+        try:
+            self.shutdown_executor()
+        finally:
+            super().stop()
+
     @override
     def timer_expired(
         self, limit: int, events: list[dict[str, Any]], signal: int, frame: FrameType | None
@@ -249,6 +249,9 @@ ENABLE_GRAVATAR = True
 GRAVATAR_REALM_OVERRIDE: dict[int, bool] = {}
 INLINE_IMAGE_PREVIEW = True
 INLINE_URL_EMBED_PREVIEW = True
+# Maximum number of a message's URLs that the embed_links worker
+# fetches at the same time.
+EMBED_LINKS_CONCURRENCY = 8
 NAME_CHANGES_DISABLED = False
 AVATAR_CHANGES_DISABLED = False
 PASSWORD_MIN_LENGTH = 8
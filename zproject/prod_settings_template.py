@@ -745,6 +745,10 @@ SOCIAL_AUTH_SAML_SUPPORT_CONTACT = {
 ## can also be disabled in a realm's organization settings.
 # INLINE_URL_EMBED_PREVIEW = True
 
+## Maximum number of a message's links whose previews are fetched at
+## the same time.
+# EMBED_LINKS_CONCURRENCY = 8
+
 
 ################
 ## Logging and error reporting.